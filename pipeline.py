@@ -2,41 +2,112 @@
 LLM-based Localization Pipeline (Incremental CI/CD)
 
 Behavior:
-- Loads en.json (source)
-- Loads existing fr.json (if any)
+- Streams en.json (source)
+- Loads existing fr.json and its source snapshots (if any)
 - Translates ONLY new or changed keys
 - Preserves existing translations
 - Enforces glossary
 - Protects placeholders
-- Writes merged fr.json
+- Writes merged fr.json (+ .fr.sources.json snapshots)
 """
 
 # ================================
 # 1. Setup & Imports
 # ================================
 
-from openai import OpenAI
+from openai import (
+    AsyncOpenAI,
+    APIConnectionError,
+    APIStatusError,
+    APITimeoutError,
+    InternalServerError,
+    RateLimitError,
+)
+from tenacity import (
+    retry,
+    retry_if_exception_type,
+    stop_after_attempt,
+    wait_random_exponential,
+)
+import ahocorasick
+import asyncio
+import diskcache
+import hashlib
+import ijson
 import os
+from collections import defaultdict
+from itertools import islice
 import json
+import orjson
 import csv
 import re
+import time
 from pathlib import Path
+from tqdm import tqdm
 
 # OpenAI client (API key comes from environment variable)
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+aclient = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 # File paths
 INPUT_FILE = Path("input/en.json")
 OUTPUT_FILE = Path("output/fr.json")
+SOURCES_FILE = Path("output/.fr.sources.json")
+
+# Sources-file entry holding the en.json + fr.json fingerprints of the last
+# completed run
+META_KEY = "__meta__"
+
+# Legacy fr.json files stored source snapshots inline under this prefix
+SOURCE_MARKER_PREFIX = "__source__:"
+
+# Model and language pair used for every translation request
+MODEL = "gpt-4o-mini"
+SOURCE_LANG = "en"
+TARGET_LANG = "fr-FR"
+
+# Persistent translation cache (survives across pipeline runs)
+cache = diskcache.Cache(os.getenv("TRANSLATION_CACHE_DIR", ".trans_cache"))
+CACHE_TTL_SECONDS = 90 * 24 * 60 * 60
+
+# API throughput limits (keep below the account's RPM ceiling)
+MAX_CONCURRENCY = int(os.getenv("MAX_CONCURRENCY", "20"))
+MAX_REQUESTS_PER_MINUTE = int(os.getenv("MAX_REQUESTS_PER_MINUTE", "500"))
+
+# Strings packed into a single chat request (amortizes per-call overhead)
+MICRO_BATCH_SIZE = int(os.getenv("MICRO_BATCH_SIZE", "20"))
+
+# Completed keys between on-disk checkpoints of fr.json during a run
+CHECKPOINT_EVERY = int(os.getenv("CHECKPOINT_EVERY", "50"))
+
+# Batch API (50% cheaper, separate rate-limit pool, up to 24h latency)
+# Used for large deltas such as full re-translations, or when forced
+USE_BATCH_API = os.getenv("USE_BATCH_API", "").lower() in ("1", "true", "yes")
+BATCH_THRESHOLD = int(os.getenv("BATCH_THRESHOLD", "500"))
+BATCH_POLL_MIN_SECONDS = 10
+BATCH_POLL_MAX_SECONDS = 600
 
 # ================================
 # 2. Load Source (en.json)
+#    Streamed: only the delta is ever held in memory
 # ================================
 
-with open(INPUT_FILE, "r", encoding="utf-8") as f:
-    source_data = json.load(f)
+def iter_source_strings(path):
+    with open(path, "rb") as f:
+        yield from ijson.kvitems(f, "")
 
-print("Loaded strings:", len(source_data))
+def file_fingerprint(path):
+    # Content fingerprint (not mtime: CI checkouts reset it on every run)
+    if not path.exists():
+        return None
+    with open(path, "rb") as f:
+        return {
+            "size": path.stat().st_size,
+            "sha1": hashlib.file_digest(f, "sha1").hexdigest(),
+        }
+
+source_fingerprint = file_fingerprint(INPUT_FILE)
+
+print("Source file:", INPUT_FILE, f"({source_fingerprint['size']} bytes)")
 
 # ================================
 # 3. Load Existing Target (fr.json)
@@ -45,11 +116,28 @@ print("Loaded strings:", len(source_data))
 
 def load_existing_translation(path):
     if path.exists():
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return orjson.loads(path.read_bytes())
     return {}
 
+def write_json_atomic(path, data):
+    # A crash mid-write leaves the previous file intact, so the delta
+    # logic never sees a truncated fr.json and re-translates everything
+    path.parent.mkdir(exist_ok=True)
+    tmp = path.with_suffix(".json.tmp")
+    tmp.write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+    os.replace(tmp, path)
+
 existing_fr = load_existing_translation(OUTPUT_FILE)
+output_fingerprint = file_fingerprint(OUTPUT_FILE)
+
+# English text each translation was made from (delta detection only,
+# kept out of the shipped fr.json)
+existing_sources = load_existing_translation(SOURCES_FILE)
+source_meta = existing_sources.pop(META_KEY, None)
+
+# Migrate legacy inline "__source__:<key>" markers into the sources file
+for marker in [key for key in existing_fr if key.startswith(SOURCE_MARKER_PREFIX)]:
+    existing_sources.setdefault(marker[len(SOURCE_MARKER_PREFIX):], existing_fr.pop(marker))
 
 # ================================
 # 4. Glossary (CSV-based terminology)
@@ -66,12 +154,38 @@ def load_glossary(csv_path):
             glossary[row["source"]] = row["target"]
     return glossary
 
+def compile_glossary(glossary):
+    # Aho-Corasick automaton: finds every term in one O(len(text)) scan
+    if not glossary:
+        return None
+    automaton = ahocorasick.Automaton()
+    for source, target in glossary.items():
+        automaton.add_word(source, (len(source), target))
+    automaton.make_automaton()
+    return automaton
+
 GLOSSARY = load_glossary("glossary.csv")
+GLOSSARY_AUTOMATON = compile_glossary(GLOSSARY)
 
-def apply_glossary(text, glossary):
-    for source, target in glossary.items():
-        text = text.replace(source, target)
-    return text
+def apply_glossary(text, automaton):
+    if automaton is None:
+        return text
+
+    # Leftmost-longest, non-overlapping matches (longer terms beat their prefixes)
+    parts = []
+    last = 0
+    for end, (length, target) in automaton.iter_long(text):
+        start = end - length + 1
+        parts.append(text[last:start])
+        parts.append(target)
+        last = end + 1
+
+    # Common case: no glossary term in the text, nothing to splice
+    if not parts:
+        return text
+
+    parts.append(text[last:])
+    return "".join(parts)
 
 # ================================
 # 5. Placeholder Handling
@@ -79,54 +193,57 @@ def apply_glossary(text, glossary):
 
 PLACEHOLDER_PATTERN = re.compile(r"\{[^}]+\}")
 
+MASK_TOKEN_PATTERN = re.compile(r"<VAR(\d+)>")
+
 def mask_placeholders(text):
-    placeholders = PLACEHOLDER_PATTERN.findall(text)
-    mapping = {}
-    masked_text = text
+    # mapping[i] holds the original placeholder for token <VAR{i + 1}>
+    mapping = []
 
-    for index, placeholder in enumerate(placeholders, start=1):
-        token = f"<VAR{index}>"
-        mapping[token] = placeholder
-        masked_text = masked_text.replace(placeholder, token)
+    def mask(match):
+        mapping.append(match.group(0))
+        return f"<VAR{len(mapping)}>"
 
-    return masked_text, mapping
+    masked_text = PLACEHOLDER_PATTERN.sub(mask, text)
+
+    # Tokens the translation must contain, known without rescanning masked_text
+    expected_tokens = frozenset(f"<VAR{index}>" for index in range(1, len(mapping) + 1))
+
+    return masked_text, mapping, expected_tokens
 
 def restore_placeholders(text, mapping):
-    restored_text = text
-    for token, original in mapping.items():
-        restored_text = restored_text.replace(token, original)
-    return restored_text
+    return MASK_TOKEN_PATTERN.sub(lambda match: mapping[int(match.group(1)) - 1], text)
 
 def extract_placeholders(text):
-    return set(re.findall(r"<VAR\d+>", text))
+    return {match.group(0) for match in MASK_TOKEN_PATTERN.finditer(text)}
 
 # ================================
 # 6. Decide WHAT needs translation
 #    (Incremental / Delta logic)
 # ================================
 
-def get_keys_to_translate(source_en, existing_fr):
+def get_keys_to_translate(source_items, existing_fr, existing_sources):
     """
     A key needs translation if:
     - It does not exist in fr.json
-    - OR the English text has changed since last run
+    - OR the English text differs from its snapshot in .fr.sources.json
     """
+    # The fr.json membership check is still needed: a snapshot can exist
+    # for a key whose translation was removed from fr.json by hand
+    return {
+        key: en_text
+        for key, en_text in source_items
+        if key not in existing_fr or existing_sources.get(key) != en_text
+    }
+
+if existing_fr and source_meta == {"source": source_fingerprint, "output": output_fingerprint}:
+    # en.json and fr.json both unchanged since the last completed run —
+    # en.json is not even parsed. Any hand edit to fr.json (a deleted or
+    # reverted translation) falls through to the full delta check below.
     keys_to_translate = {}
-
-    for key, en_text in source_en.items():
-        source_marker = f"__source__:{key}"
-
-        # New key
-        if key not in existing_fr:
-            keys_to_translate[key] = en_text
-
-        # Changed English text
-        elif existing_fr.get(source_marker) != en_text:
-            keys_to_translate[key] = en_text
-
-    return keys_to_translate
-
-keys_to_translate = get_keys_to_translate(source_data, existing_fr)
+else:
+    keys_to_translate = get_keys_to_translate(
+        iter_source_strings(INPUT_FILE), existing_fr, existing_sources
+    )
 
 print("Keys to translate:", list(keys_to_translate.keys()))
 
@@ -134,67 +251,425 @@ print("Keys to translate:", list(keys_to_translate.keys()))
 # 7. LLM Translation Function
 # ================================
 
-def llm_translate(text, source_lang="en", target_lang="fr-FR"):
-    prompt = f"""
-You are a professional localization engine.
+class RateLimiter:
+    """
+    Token bucket for requests per minute.
+    - Refills continuously up to `capacity`
+    - Drains early when OpenAI reports few remaining requests
+    """
+
+    def __init__(self, capacity, per_seconds=60):
+        self.capacity = capacity
+        self.tokens = capacity
+        self.refill = capacity / per_seconds
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill)
+        self.updated = now
+
+    async def acquire(self):
+        async with self.lock:
+            self._refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.refill)
+                self._refill()
+            self.tokens -= 1
+
+    def update_from_headers(self, headers):
+        # Server-side view wins: never hold more tokens than OpenAI allows
+        remaining = headers.get("x-ratelimit-remaining-requests")
+        if remaining is not None and remaining.isdigit():
+            self.tokens = min(self.tokens, int(remaining))
+
+limiter = RateLimiter(MAX_REQUESTS_PER_MINUTE)
+
+# Transient failures only; 4xx errors like a bad request are not retried
+RETRYABLE_ERRORS = (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError)
+
+@retry(
+    wait=wait_random_exponential(min=1, max=60),
+    stop=stop_after_attempt(6),
+    retry=retry_if_exception_type(RETRYABLE_ERRORS),
+    reraise=True,
+)
+async def create_completion(messages, **kwargs):
+    await limiter.acquire()
+
+    try:
+        raw_response = await aclient.chat.completions.with_raw_response.create(
+            model=MODEL,
+            messages=messages,
+            temperature=0.2,
+            **kwargs
+        )
+    except RateLimitError as e:
+        # Honor the server's Retry-After before backing off further
+        retry_after = e.response.headers.get("retry-after", "0")
+        if retry_after.isdigit():
+            await asyncio.sleep(int(retry_after))
+        raise
+
+    limiter.update_from_headers(raw_response.headers)
+    return raw_response.parse()
+
+# Static prompt parts, rendered once at import; only the text varies per call
+SYSTEM_MSG = {"role": "system", "content": "You translate software UI strings."}
+
+PROMPT_HEAD = f"""You are a professional localization engine.
 
 Rules:
-- Translate from {source_lang} to {target_lang}
+- Translate from {SOURCE_LANG} to {TARGET_LANG}
 - Preserve placeholders like <VAR1>, <VAR2> exactly
 - Do NOT add explanations
 - Output only the translated text
 
 Text:
-{text}
 """
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": "You translate software UI strings."},
-            {"role": "user", "content": prompt}
-        ],
-        temperature=0.2
+BATCH_PROMPT_HEAD = f"""You are a professional localization engine.
+
+Rules:
+- Translate each numbered string from {SOURCE_LANG} to {TARGET_LANG}
+- Preserve placeholders like <VAR1>, <VAR2> exactly
+- Do NOT add explanations
+- Return JSON only, with the same numbers as keys: {{"1": "...", "2": "..."}}
+
+Strings (JSON):
+"""
+
+def build_messages(text):
+    return [SYSTEM_MSG, {"role": "user", "content": PROMPT_HEAD + text}]
+
+def build_batch_messages(texts):
+    numbered = json.dumps(
+        {str(index): text for index, text in enumerate(texts, start=1)},
+        ensure_ascii=False,
+        indent=0,
     )
+    return [SYSTEM_MSG, {"role": "user", "content": BATCH_PROMPT_HEAD + numbered}]
+
+# Prompt changes invalidate cached translations made with the old prompt
+PROMPT_VERSION = hashlib.sha256(
+    (SYSTEM_MSG["content"] + PROMPT_HEAD + BATCH_PROMPT_HEAD).encode("utf-8")
+).hexdigest()[:16]
 
+def cache_key(text):
+    return hashlib.sha256(f"{MODEL}|{TARGET_LANG}|{PROMPT_VERSION}|{text}".encode("utf-8")).hexdigest()
+
+# Answers collected from a batch left behind by an interrupted run, keyed by
+# masked text; served like cache hits and cached once they pass QA
+recovered_translations = {}
+
+def lookup_translation(text):
+    recovered = recovered_translations.get(text)
+    if recovered is not None:
+        return recovered
+    return cache.get(cache_key(text))
+
+async def llm_translate(text):
+    cached = lookup_translation(text)
+    if cached is not None:
+        return cached
+
+    response = await create_completion(build_messages(text))
     return response.choices[0].message.content.strip()
 
+async def llm_translate_batch(texts):
+    """
+    Translate several strings with one chat request.
+    Returns translations in input order; strings the model dropped
+    are retried one by one.
+    """
+    translations = [lookup_translation(text) for text in texts]
+    misses = [index for index, translation in enumerate(translations) if translation is None]
+
+    if len(misses) == 1:
+        translations[misses[0]] = await llm_translate(texts[misses[0]])
+        return translations
+    if not misses:
+        return translations
+
+    response = await create_completion(
+        build_batch_messages([texts[index] for index in misses]),
+        response_format={"type": "json_object"},
+    )
+    try:
+        parsed = json.loads(response.choices[0].message.content)
+    except json.JSONDecodeError:
+        parsed = {}
+    if not isinstance(parsed, dict):
+        parsed = {}
+
+    for number, index in enumerate(misses, start=1):
+        translation = parsed.get(str(number))
+        if isinstance(translation, str):
+            translations[index] = translation.strip()
+        else:
+            translations[index] = await llm_translate(texts[index])
+
+    return translations
+
+# Batch submitted by a run that did not live to collect it (CI timeout,
+# crash, cancellation); the next run resumes polling instead of paying twice
+PENDING_BATCH_FILE = Path(cache.directory) / "pending_batch.json"
+
+def load_pending_batch():
+    return load_existing_translation(PENDING_BATCH_FILE) or None
+
+def clear_pending_batch():
+    PENDING_BATCH_FILE.unlink(missing_ok=True)
+
+async def create_batch(texts):
+    lines = [
+        json.dumps({
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {"model": MODEL, "messages": build_messages(text), "temperature": 0.2},
+        }, ensure_ascii=False)
+        for custom_id, text in texts.items()
+    ]
+
+    batch_input = await aclient.files.create(
+        file=("batch_input.jsonl", "\n".join(lines).encode("utf-8")),
+        purpose="batch",
+    )
+    batch = await aclient.batches.create(
+        input_file_id=batch_input.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h",
+    )
+
+    # Persist before polling so an interrupted run can pick it back up
+    write_json_atomic(PENDING_BATCH_FILE, {"batch_id": batch.id, "texts": texts})
+    print("📦 Submitted batch:", batch.id)
+    return batch.id
+
+async def collect_batch(batch_id):
+    # Poll with exponential backoff until the batch reaches a final state
+    batch = await aclient.batches.retrieve(batch_id)
+    delay = BATCH_POLL_MIN_SECONDS
+    while batch.status not in ("completed", "failed", "expired", "cancelled"):
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, BATCH_POLL_MAX_SECONDS)
+        batch = await aclient.batches.retrieve(batch_id)
+
+    # Expired or cancelled batches still publish the requests they finished
+    results = {}
+    if batch.output_file_id:
+        output = await aclient.files.content(batch.output_file_id)
+        for line in output.text.splitlines():
+            record = json.loads(line)
+            response = record.get("response")
+            if response and response["status_code"] == 200:
+                content = response["body"]["choices"][0]["message"]["content"]
+                results[record["custom_id"]] = content.strip()
+
+    clear_pending_batch()
+    return batch.status, results
+
+async def resume_pending_batch(masked_texts):
+    """
+    Settle a batch submitted by an interrupted run before this run pays
+    for the same strings again.
+    """
+    pending = load_pending_batch()
+    if pending is None:
+        return
+
+    batch_id = pending["batch_id"]
+    submitted = pending["texts"]
+
+    # Nothing in this delta was in that batch: stop paying for it
+    if masked_texts.isdisjoint(submitted.values()):
+        print("📦 Discarding pending batch no longer needed:", batch_id)
+        try:
+            await aclient.batches.cancel(batch_id)
+        except APIStatusError:
+            pass  # already in a final state
+        clear_pending_batch()
+        return
+
+    print("📦 Resuming batch:", batch_id)
+    status, results = await collect_batch(batch_id)
+    if status != "completed":
+        print(f"⚠️ Batch {batch_id} ended with status '{status}' — "
+              f"{len(results)} results recovered, the rest is translated again")
+
+    for custom_id, translation in results.items():
+        recovered_translations[submitted[custom_id]] = translation
+
+async def submit_batch(texts):
+    """
+    Translate {custom_id: text} through the OpenAI Batch API.
+    Returns {custom_id: translation} for every request that succeeded.
+    """
+    batch_id = await create_batch(texts)
+    status, results = await collect_batch(batch_id)
+    if status != "completed":
+        if not results:
+            raise RuntimeError(f"❌ Batch {batch_id} ended with status '{status}'")
+        print(f"⚠️ Batch {batch_id} ended with status '{status}' — {len(results)} results kept")
+    return results
+
 # ================================
 # 8. Translate ONLY delta keys
 # ================================
 
-for key, en_text in keys_to_translate.items():
-    # 1. Mask source
-    masked_text, mapping = mask_placeholders(en_text)
-
-    # 2. Translate (masked)
-    masked_translation = llm_translate(masked_text)
-    masked_translation = apply_glossary(masked_translation, GLOSSARY)
+def finalize_translation(key, masked_text, mapping, expected_tokens, masked_translation):
+    glossary_translation = apply_glossary(masked_translation, GLOSSARY_AUTOMATON)
 
     # 3. QA — validate masked placeholders
-    src_vars = extract_placeholders(masked_text)
-    tgt_vars = extract_placeholders(masked_translation)
-
-    if src_vars != tgt_vars:
+    if expected_tokens != extract_placeholders(glossary_translation):
         raise ValueError(f"❌ Placeholder mismatch in key '{key}'")
 
-    # 4. Restore placeholders ONLY after QA
-    final_text = restore_placeholders(masked_translation, mapping)
+    # Cache only translations that passed QA, so a bad reply is retried
+    # on the next run instead of being replayed from the cache
+    cache.set(cache_key(masked_text), masked_translation, expire=CACHE_TTL_SECONDS)
 
-    # 5. Save result + source snapshot
-    existing_fr[key] = final_text
-    existing_fr[f"__source__:{key}"] = en_text
+    # 4. Restore placeholders ONLY after QA
+    return restore_placeholders(glossary_translation, mapping)
+
+async def translate_chunk(items):
+    # 1. Mask sources
+    masked = [mask_placeholders(en_text) for _, en_text in items]
+
+    # 2. Translate (masked), one request for the whole chunk
+    masked_translations = await llm_translate_batch([masked_text for masked_text, _, _ in masked])
+
+    # QA and restore stay per string
+    return [
+        (key, finalize_translation(key, masked_text, mapping, expected_tokens, masked_translation), en_text)
+        for (key, en_text), (masked_text, mapping, expected_tokens), masked_translation
+        in zip(items, masked, masked_translations)
+    ]
+
+def chunked(items, size):
+    iterator = iter(items)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+async def worker(queue, on_results):
+    # Queue is filled up front, so an empty queue means the work is done
+    while True:
+        try:
+            chunk = queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        on_results(await translate_chunk(chunk))
+
+async def translate_all(keys_to_translate, on_results):
+    # API calls are I/O-bound, so MAX_CONCURRENCY workers pull chunks of
+    # delta keys concurrently, paced by the RPM limiter
+    queue = asyncio.Queue()
+    for chunk in chunked(keys_to_translate.items(), MICRO_BATCH_SIZE):
+        queue.put_nowait(chunk)
+
+    workers = [
+        asyncio.create_task(worker(queue, on_results))
+        for _ in range(min(MAX_CONCURRENCY, queue.qsize()))
+    ]
+    try:
+        await asyncio.gather(*workers)
+    finally:
+        # First failure aborts the run; stop the other workers too
+        for task in workers:
+            task.cancel()
+
+async def translate_all_batch(keys_to_translate, on_results):
+    # 1. Mask every source up front, keyed by the i18n key as custom_id
+    masked = {key: mask_placeholders(en_text) for key, en_text in keys_to_translate.items()}
+
+    # 2. Translate (masked) — cache hits first, the rest through the Batch API
+    translations = {}
+    misses = {}
+    for key, (masked_text, _, _) in masked.items():
+        cached = lookup_translation(masked_text)
+        if cached is not None:
+            translations[key] = cached
+        else:
+            misses[key] = masked_text
+
+    if misses:
+        translations.update(await submit_batch(misses))
+
+    on_results([
+        (key, finalize_translation(key, masked_text, mapping, expected_tokens, translations[key]), keys_to_translate[key])
+        for key, (masked_text, mapping, expected_tokens) in masked.items()
+        if key in translations
+    ])
+
+    # Requests that failed inside the batch fall back to realtime calls
+    failed = {key: en_text for key, en_text in keys_to_translate.items() if key not in translations}
+    if failed:
+        print("Batch failures retried in realtime:", list(failed.keys()))
+        await translate_all(failed, on_results)
+
+# Identical English strings under different keys ("OK", "Cancel") are
+# translated once, through the first key that uses them
+owners = defaultdict(list)
+for key, en_text in keys_to_translate.items():
+    owners[en_text].append(key)
+unique_texts = {keys[0]: en_text for en_text, keys in owners.items()}
+
+print("Unique strings to translate:", len(unique_texts))
+
+async def translate_delta(texts, on_results):
+    # A batch left by an interrupted run is settled first, whatever the size
+    # of this run, so the realtime path does not pay for it a second time
+    masked_texts = {mask_placeholders(en_text)[0] for en_text in texts.values()}
+    await resume_pending_batch(masked_texts)
+
+    unresolved = len(masked_texts - recovered_translations.keys())
+    if USE_BATCH_API or unresolved > BATCH_THRESHOLD:
+        await translate_all_batch(texts, on_results)
+    else:
+        await translate_all(texts, on_results)
+
+def write_checkpoint():
+    # No fingerprint: a resumed run must re-check the delta, which then
+    # skips every key already saved here
+    write_json_atomic(OUTPUT_FILE, existing_fr)
+    write_json_atomic(SOURCES_FILE, existing_sources)
+
+progress = tqdm(total=len(keys_to_translate), desc="Translating", unit="key")
+
+# 5. Save results + source snapshots as chunks complete
+def save_results(results):
+    done_before = progress.n
+    for _, final_text, en_text in results:
+        # Fan the translation out to every key sharing this source text
+        for key in owners[en_text]:
+            existing_fr[key] = final_text
+            existing_sources[key] = en_text
+        progress.update(len(owners[en_text]))
+
+    if progress.n // CHECKPOINT_EVERY > done_before // CHECKPOINT_EVERY:
+        write_checkpoint()
+
+try:
+    asyncio.run(translate_delta(unique_texts, save_results))
+finally:
+    progress.close()
 
 print("✅ QA PASSED — placeholders are safe")
 
+# Drop expired cache entries and release the cache handle
+cache.expire()
+cache.close()
+
 # ================================
-# 10. Write Output (merged fr.json)
+# 10. Write Output (merged fr.json + source snapshots)
 # =============================
 
-OUTPUT_FILE.parent.mkdir(exist_ok=True)
-
-with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-    json.dump(existing_fr, f, ensure_ascii=False, indent=2)
+write_json_atomic(OUTPUT_FILE, existing_fr)
+write_json_atomic(SOURCES_FILE, {
+    META_KEY: {"source": source_fingerprint, "output": file_fingerprint(OUTPUT_FILE)},
+    **existing_sources,
+})
 
 print("🎉 Translation pipeline completed successfully!")
 print("📁 Output file:", OUTPUT_FILE)